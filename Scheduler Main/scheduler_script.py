@@ -1,4 +1,15 @@
 #I am using code from CS110 Session 13 [7.2] Heaps and Priority Queues
+import copy
+import hashlib
+import heapq
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
 
 class MaxHeap:
     """
@@ -179,14 +190,15 @@ class TaskScheduler:
     def format_time(self, time):
         return f"{time // 60}h{time % 60:02d}"
 
-    def run_task_scheduler(self, starting_time, completed_task_order=None, suppress_output=False):
+    def run_task_scheduler(self, starting_time, completed_task_order=None, suppress_output=False, dispatch_log=None):
         current_time = starting_time
         total_utils = 0
 
         if not suppress_output:
             print("Running a priority-based scheduler:\n")
 
-        while self.check_unscheduled_tasks():
+        #keep going while tasks wait in the queue, not only while some are not started
+        while self.check_unscheduled_tasks() or len(self.priority_queue) > 0:
             #recalculate priorities dynamically for all tasks
             self.update_priorities()  #dynamic recalculation
             self.get_tasks_ready(current_time)
@@ -205,6 +217,9 @@ class TaskScheduler:
                 self.update_priorities()
                 if completed_task_order is not None:
                     completed_task_order.append(task.id)
+                if dispatch_log is not None:
+                    #(start time, finish time, task id, utils) for every dispatched task
+                    dispatch_log.append((current_time - task.duration, current_time, task.id, task.priority))
                 if not suppress_output:
                     print(f"\t✅ t={self.format_time(current_time)}, task completed!")
             else:
@@ -221,6 +236,482 @@ class TaskScheduler:
             print(f"\n🏁 Completed all planned tasks in {total_time // 60}h{total_time % 60:02d}min!")
             print(f"Total utility points (utils) accumulated: {total_utils}")
 
+def graph_fingerprint(tasks, starting_time):
+    """
+    Returns a canonical fingerprint of a task graph and its run parameters.
+    Only fields that affect scheduling (including status) are included, and tasks and dependencies
+    are sorted, so the same graph gives the same fingerprint whatever order the tasks are listed in.
+    """
+    canonical = sorted(
+        (task.id, task.duration, sorted(task.dependencies), task.is_fixed, task.start_time, task.importance, task.status)
+        for task in tasks
+    )
+    payload = json.dumps([starting_time, canonical], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _schedule_result(dispatch_log):
+    #completed order, (start, finish, id, utils) timings and total utils of one run, stored as tuples
+    return {
+        "order": tuple(task_id for _, _, task_id, _ in dispatch_log),
+        "timings": tuple(tuple(record) for record in dispatch_log),
+        "total_utils": sum(utils for _, _, _, utils in dispatch_log),
+    }
+
+
+class ScheduleCache:
+    """
+    Bounded LRU cache of schedule results keyed by graph_fingerprint.
+    Results live in memory and, if a directory is given, also as one JSON file per fingerprint on disk.
+    Each result is a dict with the completed order, timings and total utils.
+    Order and timings are stored as tuples and every lookup returns a new dict,
+    so callers cannot change what later lookups see.
+    """
+    DISK_SUFFIX = ".schedule.json" #only files with this suffix are read or evicted
+
+    def __init__(self, max_entries=1024, path=None, max_disk_entries=None):
+        """
+        Parameters:
+        max_entries (int): maximum number of results kept in memory, least recently used are evicted first.
+        path (str): optional directory for the on-disk copy of results.
+        max_disk_entries (int): maximum number of results kept on disk, defaults to max_entries.
+        """
+        self.max_entries = max_entries
+        self.path = path
+        self.max_disk_entries = max_entries if max_disk_entries is None else max_disk_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def _disk_file(self, key):
+        return os.path.join(self.path, f"{key}{self.DISK_SUFFIX}")
+
+    def get(self, key):
+        """
+        Returns a copy of the cached result for a fingerprint, or None if it is not cached.
+        """
+        result = self.entries.get(key)
+        if result is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+        if self.path is not None:
+            result = self._load(key)
+            if result is not None:
+                self._remember(key, result)
+                self.hits += 1
+                return dict(result)
+        self.misses += 1
+        return None
+
+    def _load(self, key):
+        #a missing, unreadable or malformed file is a miss
+        try:
+            with open(self._disk_file(key)) as f:
+                result = _schedule_result(json.load(f)["timings"])
+            os.utime(self._disk_file(key)) #mark as recently used for disk eviction
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return result
+
+    def put(self, key, result):
+        result = _schedule_result(result["timings"])
+        self._remember(key, result)
+        if self.path is not None:
+            #write to a temporary file and rename it, so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(result, f)
+            os.replace(tmp_path, self._disk_file(key))
+            self._evict_disk()
+
+    def _evict_disk(self):
+        #remove the least recently used cache files beyond max_disk_entries, other files are left alone
+        files = []
+        for name in os.listdir(self.path):
+            if name.endswith(self.DISK_SUFFIX):
+                file = os.path.join(self.path, name)
+                try:
+                    files.append((os.path.getmtime(file), file))
+                except OSError:
+                    pass #removed by another process in the meantime
+        files.sort()
+        for _, file in files[:max(0, len(files) - self.max_disk_entries)]:
+            try:
+                os.remove(file)
+            except OSError:
+                pass
+
+    def _remember(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False) #evict the least recently used result
+
+    def __len__(self):
+        return len(self.entries)
+
+    def schedule(self, tasks, starting_time):
+        """
+        Returns the schedule result for tasks, running the scheduler only on a cache miss.
+        Tasks are scheduled as copies in id order, so they are never modified and
+        the result depends only on the fingerprint.
+
+        Raises:
+            RuntimeError: If the run does not cover every not-started task, in which case nothing is cached.
+        """
+        key = graph_fingerprint(tasks, starting_time)
+        result = self.get(key)
+        if result is None:
+            result = _schedule_result(_run_shard(tasks, starting_time))
+            expected = sorted(task.id for task in tasks if task.status == TaskScheduler.NOT_STARTED)
+            if sorted(result["order"]) != expected:
+                raise RuntimeError("Schedule does not cover every not-started task, not caching it")
+            self.put(key, result)
+        return dict(result)
+
+
+def _blocked_tasks(tasks):
+    #ids of tasks that can never become ready because they are on or behind a dependency cycle
+    waiting = {task.id: set(task.dependencies) for task in tasks}
+    dependents = {}
+    for task in tasks:
+        for dep in set(task.dependencies):
+            dependents.setdefault(dep, []).append(task.id)
+    ready = [task_id for task_id, deps in waiting.items() if not deps]
+    while ready:
+        done = ready.pop()
+        del waiting[done]
+        for task_id in dependents.get(done, []):
+            waiting[task_id].discard(done)
+            if not waiting[task_id]:
+                ready.append(task_id)
+    return sorted(waiting)
+
+
+def _run_shard(shard_tasks, starting_time):
+    """
+    Runs one shard on its own TaskScheduler and returns its dispatch log.
+    The shard is scheduled on copies, so the caller's tasks keep their status and dependencies.
+
+    Raises:
+        RuntimeError: If a not-started task was left undispatched.
+    Tasks are fed in id order, so equal-priority ties do not depend on input order.
+    Kept at module level so it can be sent to worker processes.
+    """
+    dispatch_log = []
+    task_copies = sorted(copy.deepcopy(shard_tasks), key=lambda task: task.id)
+    TaskScheduler(task_copies).run_task_scheduler(starting_time, suppress_output=True, dispatch_log=dispatch_log)
+    not_started = sum(1 for task in shard_tasks if task.status == TaskScheduler.NOT_STARTED)
+    if len(dispatch_log) != not_started:
+        raise RuntimeError(f"Shard dispatched {len(dispatch_log)} of {not_started} tasks")
+    return dispatch_log
+
+
+class ShardedTaskScheduler:
+    """
+    Runs many independent task lists (one per tenant) as separate shards,
+    so tenants never pay for each other's scans.
+    A tenant is one shard with one timeline, exactly as TaskScheduler would run its list:
+    splitting a tenant further would let its independent tasks overlap in time.
+    The per-shard dispatch logs are combined into one stream ordered by start time
+    with a heap-based k-way merge.
+    With a ScheduleCache, unchanged tenants reuse their earlier results instead of being rescheduled.
+    """
+
+    def __init__(self, tenants, max_workers=None, parallel_threshold=2000, cache=None):
+        """
+        Parameters:
+        tenants (dict or list): mapping of tenant -> list of Task, or a single list of Task.
+        max_workers (int): number of worker processes, defaults to the number of cores.
+        parallel_threshold (int): minimum total number of tasks before shards are sent to worker processes.
+        cache (ScheduleCache): optional cache of per-tenant results.
+
+        Raises:
+            ValueError: If a task depends on an id that is not in its tenant's list,
+            or a tenant's dependencies contain a cycle.
+        """
+        if not isinstance(tenants, dict):
+            tenants = {None: tenants}
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.parallel_threshold = parallel_threshold
+        self.cache = cache
+        self.shards = [] #list of (tenant, shard tasks), in insertion order
+        for tenant, tenant_tasks in tenants.items():
+            ids = {task.id for task in tenant_tasks}
+            for task in tenant_tasks:
+                for dep in task.dependencies:
+                    if dep not in ids:
+                        raise ValueError(f"Task {task.id} depends on unknown task {dep}")
+            blocked = _blocked_tasks(tenant_tasks)
+            if blocked:
+                raise ValueError(f"Tenant {tenant!r} has a dependency cycle, tasks {blocked} can never run")
+            self.shards.append((tenant, list(tenant_tasks)))
+
+    def _use_processes(self, shard_tasks):
+        #worker processes only pay off for many tasks; fork keeps the script from being re-run in children
+        total_tasks = sum(len(tasks) for tasks in shard_tasks)
+        return (self.max_workers > 1 and len(shard_tasks) > 1 and
+                total_tasks >= self.parallel_threshold and
+                "fork" in multiprocessing.get_all_start_methods())
+
+    def run_shards(self, starting_time):
+        """
+        Runs every shard and returns their dispatch logs in shard order.
+        Shards are always scheduled on copies, so repeated runs give the same result.
+        """
+        logs = [None] * len(self.shards)
+        keys = [None] * len(self.shards)
+        if self.cache is not None:
+            for i, (_, tasks) in enumerate(self.shards):
+                keys[i] = graph_fingerprint(tasks, starting_time)
+                cached = self.cache.get(keys[i])
+                if cached is not None:
+                    logs[i] = cached["timings"]
+
+        pending = [i for i, log in enumerate(logs) if log is None]
+        shard_tasks = [self.shards[i][1] for i in pending]
+        if not self._use_processes(shard_tasks):
+            results = [_run_shard(tasks, starting_time) for tasks in shard_tasks]
+        else:
+            workers = min(self.max_workers, len(shard_tasks))
+            chunksize = max(1, len(shard_tasks) // (workers * 4)) #batch small shards to limit IPC overhead
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as executor:
+                results = list(executor.map(_run_shard, shard_tasks, [starting_time] * len(shard_tasks), chunksize=chunksize))
+
+        for i, log in zip(pending, results):
+            logs[i] = log
+            if self.cache is not None:
+                self.cache.put(keys[i], _schedule_result(log))
+        return logs
+
+    def dispatch_stream(self, starting_time):
+        """
+        Yields (start time, finish time, tenant, task id, utils) for every task across all shards,
+        ordered by start time. Ties keep shard order.
+        """
+        shard_logs = []
+        for (tenant, _), log in zip(self.shards, self.run_shards(starting_time)):
+            shard_logs.append([(start, finish, tenant, task_id, utils) for start, finish, task_id, utils in log])
+        return heapq.merge(*shard_logs, key=lambda record: record[0])
+
+    def format_time(self, time):
+        return f"{time // 60}h{time % 60:02d}"
+
+    def run_sharded_scheduler(self, starting_time, suppress_output=False):
+        """
+        Runs all shards and returns the merged dispatch stream as a list.
+        """
+        if not suppress_output:
+            print(f"Running a sharded scheduler over {len(self.shards)} shards:\n")
+        stream = list(self.dispatch_stream(starting_time))
+        if not suppress_output:
+            for start, finish, tenant, task_id, utils in stream:
+                print(f"🕰t={self.format_time(start)} [{tenant}] task {task_id} until {self.format_time(finish)}, utils = {utils}.")
+            total_utils = sum(record[4] for record in stream)
+            print(f"\n🏁 Dispatched {len(stream)} tasks across {len(self.shards)} shards!")
+            print(f"Total utility points (utils) accumulated: {total_utils}")
+        return stream
+
+def _ready_utility(task):
+    #utils a task earns when dispatched: by then all of its dependencies are done
+    ready = copy.copy(task)
+    ready.dependencies = []
+    ready.calculate_priority()
+    return ready.priority
+
+
+def _beam_search_worker(optimizer, roots, best, node_budget, deadline):
+    #module level so that subtrees can be searched in worker processes
+    return optimizer._beam_search(roots, best, node_budget, deadline)
+
+
+class ScheduleOptimizer:
+    """
+    Lookahead optimisation mode: beam search over dispatch orders.
+    A state is (completed set, time); each step dispatches one ready task, and fixed tasks
+    may also be dispatched ahead of time by idling until their start time.
+    The objective is to maximise total utils, then to finish as early as possible.
+    Utils of a ready task do not depend on the order, so without a horizon every complete
+    schedule earns the same utils and the search effectively minimises the finish time.
+    With a horizon, only tasks finishing by the horizon earn their utils.
+    """
+
+    def __init__(self, tasks, beam_width=32, node_budget=200000, time_budget=None, horizon=None, max_workers=1):
+        """
+        Parameters:
+        tasks (list): tasks to schedule, they are not modified.
+        beam_width (int): number of states kept per depth.
+        node_budget (int): maximum number of expanded states, split evenly across worker processes.
+        time_budget (float): optional wall-clock limit in seconds, shared by all worker processes.
+        horizon (int): optional end of the day in minutes, tasks finishing later earn no utils.
+        max_workers (int): worker processes used to search first-level subtrees in parallel.
+
+        Raises:
+            ValueError: If a task depends on an id that is not in the list, or the dependencies contain a cycle.
+        """
+        self.tasks = sorted(tasks, key=lambda task: task.id)
+        self.beam_width = beam_width
+        self.node_budget = node_budget
+        self.time_budget = time_budget
+        self.horizon = horizon
+        self.max_workers = max_workers
+
+        index = {task.id: i for i, task in enumerate(self.tasks)}
+        self.dep_masks = []
+        for task in self.tasks:
+            mask = 0
+            for dep in task.dependencies:
+                if dep not in index:
+                    raise ValueError(f"Task {task.id} depends on unknown task {dep}")
+                mask |= 1 << index[dep]
+            self.dep_masks.append(mask)
+        #topological pass over the masks: tasks that never become ready are on or behind a cycle
+        ready_mask, progress = 0, True
+        while progress:
+            progress = False
+            for i, mask in enumerate(self.dep_masks):
+                if not ready_mask >> i & 1 and not mask & ~ready_mask:
+                    ready_mask |= 1 << i
+                    progress = True
+        blocked = [task.id for i, task in enumerate(self.tasks) if not ready_mask >> i & 1]
+        if blocked:
+            raise ValueError(f"Dependency cycle, tasks {blocked} can never run")
+        self.durations = [task.duration for task in self.tasks]
+        self.utils = [_ready_utility(task) for task in self.tasks]
+        self.fixed_starts = [task.start_time if task.is_fixed else None for task in self.tasks]
+        #fixed tasks by latest possible finish first, so the finish bound stops at the first one left
+        self.fixed_ends = sorted(((start + self.durations[i], i) for i, start in enumerate(self.fixed_starts)
+                                  if start is not None), reverse=True)
+        self.full_mask = (1 << len(self.tasks)) - 1
+
+    def _earns(self, finish):
+        return self.horizon is None or finish <= self.horizon
+
+    def _bounds(self, mask, time, utils, remaining_utils, remaining_duration):
+        #optimistic (utils, finish time) for any completion of this state
+        upper = utils if self.horizon is not None and time >= self.horizon else utils + remaining_utils
+        finish = time + remaining_duration
+        for end, i in self.fixed_ends:
+            if not mask >> i & 1:
+                return upper, max(finish, end)
+        return upper, finish
+
+    def _children(self, state):
+        mask, time, utils, remaining_utils, remaining_duration, path = state
+        for i in range(len(self.tasks)):
+            if mask >> i & 1 or self.dep_masks[i] & ~mask:
+                continue
+            start = time if self.fixed_starts[i] is None else max(time, self.fixed_starts[i])
+            finish = start + self.durations[i]
+            gained = self.utils[i] if self._earns(finish) else 0
+            yield (mask | 1 << i, finish, utils + gained, remaining_utils - self.utils[i],
+                   remaining_duration - self.durations[i], (path, i, start))
+
+    def _root(self, starting_time):
+        return (0, starting_time, 0, sum(self.utils), sum(self.durations), None)
+
+    def _beam_search(self, layer, best, node_budget, deadline):
+        """
+        Runs beam search from the states in layer and returns (best, nodes, exhaustive).
+        best is the incumbent (utils, finish time, path) and is only replaced by a strictly better schedule.
+        States are memoised per depth by (completed set, time) and pruned by their utils upper bound.
+        The search stops after node_budget expanded states or at the perf_counter() deadline.
+        """
+        nodes = 0
+        exhaustive = True
+        while layer:
+            seen = {} #(completed set, time) -> best utils at this depth
+            ranked = []
+            for state in layer:
+                nodes += 1
+                for child in self._children(state):
+                    mask, time, utils = child[0], child[1], child[2]
+                    if mask == self.full_mask:
+                        if (utils, -time) > (best[0], -best[1]):
+                            best = (utils, time, child[5])
+                        continue
+                    upper, finish = self._bounds(mask, time, utils, child[3], child[4])
+                    if (upper, -finish) <= (best[0], -best[1]):
+                        continue
+                    if seen.get((mask, time), -1) >= utils:
+                        continue
+                    seen[(mask, time)] = utils
+                    ranked.append((-upper, finish, time, -utils, len(ranked), child))
+                if nodes >= node_budget or (deadline is not None and perf_counter() > deadline):
+                    return best, nodes, False
+            if len(ranked) > self.beam_width:
+                exhaustive = False
+            layer = [entry[-1] for entry in heapq.nsmallest(self.beam_width, ranked)]
+        return best, nodes, exhaustive
+
+    def _timings(self, path):
+        timings = []
+        while path is not None:
+            path, i, start = path
+            timings.append((start, start + self.durations[i], self.tasks[i].id, self.utils[i]))
+        return timings[::-1]
+
+    def _summary(self, timings):
+        earned = [record for record in timings if self._earns(record[1])]
+        return {
+            "order": [task_id for _, _, task_id, _ in timings],
+            "timings": timings,
+            "total_utils": sum(utils for _, _, _, utils in earned),
+            "finish_time": timings[-1][1] if timings else None,
+        }
+
+    def greedy_baseline(self, starting_time):
+        """
+        Runs the greedy TaskScheduler on copies of the tasks and scores it like the search.
+        """
+        dispatch_log = []
+        task_copies = copy.deepcopy(self.tasks)
+        for task in task_copies:
+            task.status = TaskScheduler.NOT_STARTED
+        TaskScheduler(task_copies).run_task_scheduler(starting_time, suppress_output=True, dispatch_log=dispatch_log)
+        return self._summary(dispatch_log)
+
+    def optimize(self, starting_time):
+        """
+        Searches for a schedule better than the greedy one and returns a dict with the best
+        order, timings, total utils and finish time, the greedy baseline, the gaps between them,
+        the number of expanded states and whether the search was exhaustive (proven optimal).
+        """
+        greedy = self.greedy_baseline(starting_time)
+        root = self._root(starting_time)
+        best = (greedy["total_utils"], greedy["timings"][-1][1] if greedy["timings"] else starting_time, None)
+        deadline = None if self.time_budget is None else perf_counter() + self.time_budget
+
+        roots = []
+        if self.max_workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+            roots = list(self._children(root))
+        if len(roots) > 1:
+            groups = [roots[i::self.max_workers] for i in range(self.max_workers) if roots[i::self.max_workers]]
+            node_budget = max(1, self.node_budget // len(groups))
+            with ProcessPoolExecutor(max_workers=len(groups), mp_context=multiprocessing.get_context("fork")) as executor:
+                outcomes = list(executor.map(_beam_search_worker, [self] * len(groups), groups, [best] * len(groups),
+                                             [node_budget] * len(groups), [deadline] * len(groups)))
+            nodes = 1 + sum(outcome[1] for outcome in outcomes)
+            exhaustive = all(outcome[2] for outcome in outcomes)
+            for outcome in outcomes:
+                if (outcome[0][0], -outcome[0][1]) > (best[0], -best[1]):
+                    best = outcome[0]
+        else:
+            best, nodes, exhaustive = self._beam_search([root], best, self.node_budget, deadline)
+
+        timings = greedy["timings"] if best[2] is None else self._timings(best[2])
+        result = self._summary(timings)
+        result["greedy"] = greedy
+        result["utils_gap"] = result["total_utils"] - greedy["total_utils"]
+        result["time_gap"] = (greedy["finish_time"] - result["finish_time"]) if timings else 0
+        result["nodes"] = nodes
+        result["proven_optimal"] = exhaustive
+        return result
+
+
 #tasks with unordered input
 tasks = [
     Task(id=10, description='Go to sleep', duration=10, dependencies=[1, 2, 3, 4, 5, 6, 7, 8, 9], is_fixed=True, start_time=22 * 60, importance="high"),
@@ -331,4 +822,193 @@ task_no_dependencies = [
 
 print("Running scheduler with original task order:")
 completed_order_tasks = []
-task_scheduler1 = TaskScheduler(task_no_dependencies)
\ No newline at end of file
+task_scheduler1 = TaskScheduler(task_no_dependencies)
+
+#sharded scheduling: one task list per team, each team gets its own timeline
+def daily_tasks():
+    return [
+        Task(id=1, description='Wake-up and Preparation', duration=5, dependencies=[], is_fixed=True, start_time=9 * 60, importance="high"),
+        Task(id=2, description='Morning care routine', duration=10, dependencies=[1], importance="high"),
+        Task(id=3, description='Branch from a local Taiwanese family', duration=20, dependencies=[1, 2], importance="low"),
+        Task(id=4, description='Medicines I', duration=15, dependencies=[3], importance="medium"),
+        Task(id=5, description='Work on a personal project', duration=120, dependencies=[1, 3, 4], is_fixed=True, start_time=10 * 60, importance="medium"),
+        Task(id=6, description='Getting boba drink', duration=30, dependencies=[3, 4, 5], importance="low"),
+        Task(id=7, description='2 classes (+PCWs)', duration=360, dependencies=[1, 6, 3, 4], is_fixed=True, start_time=13 * 60, importance="high"),
+        Task(id=8, description='Dinner from a local Taiwanese family', duration=40, dependencies=[7, 3], importance="medium"),
+        Task(id=9, description='Medicines II', duration=20, dependencies=[4, 7, 8], importance="medium"),
+        Task(id=10, description='Go to sleep', duration=10, dependencies=[1, 2, 3, 4, 5, 6, 7, 8, 9], is_fixed=True, start_time=22 * 60, importance="high"),
+    ]
+
+sharded_scheduler = ShardedTaskScheduler({"team-a": daily_tasks(), "team-b": daily_tasks()})
+sharded_stream = sharded_scheduler.run_sharded_scheduler(starting_time=9 * 60, suppress_output=True)
+assert [start for start, *_ in sharded_stream] == sorted(start for start, *_ in sharded_stream), "Test failed: Dispatch stream is not ordered by start time."
+for team in ("team-a", "team-b"):
+    team_order = [task_id for _, _, tenant, task_id, _ in sharded_stream if tenant == team]
+    assert team_order == completed_order_task2, f"Test failed: Sharded order for {team} differs from the single scheduler."
+assert sharded_scheduler.run_sharded_scheduler(starting_time=9 * 60, suppress_output=True) == sharded_stream, "Test failed: Second sharded run differs from the first."
+
+#a team with two independent tasks still runs them one after the other, like TaskScheduler
+def two_component_tasks():
+    return [
+        Task(id=1, description='Stand-up meeting', duration=30, dependencies=[], is_fixed=True, start_time=9 * 60, importance="high"),
+        Task(id=2, description='Write report', duration=30, dependencies=[], importance="medium"),
+    ]
+
+single_log = []
+TaskScheduler(two_component_tasks()).run_task_scheduler(starting_time=9 * 60, suppress_output=True, dispatch_log=single_log)
+team_c_stream = ShardedTaskScheduler({"team-c": two_component_tasks()}).run_sharded_scheduler(starting_time=9 * 60, suppress_output=True)
+assert [(start, finish, task_id, utils) for start, finish, _, task_id, utils in team_c_stream] == single_log, "Test failed: Sharding changed a team's schedule."
+assert [start for start, *_ in team_c_stream] == [9 * 60, 9 * 60 + 30], "Test failed: Independent tasks of one team overlap."
+
+#every task of every team is dispatched exactly once, also for graphs with several ready tasks at a time
+def random_team_tasks(count, seed):
+    rng = random.Random(seed)
+    return [Task(id=task_id, description=f'Task {task_id}', duration=rng.randint(5, 60),
+                 dependencies=rng.sample(range(1, task_id), rng.randint(0, min(2, task_id - 1))),
+                 importance=rng.choice(["high", "medium", "low"])) for task_id in range(1, count + 1)]
+
+random_teams = {f"team-{seed}": random_team_tasks(7, seed) for seed in range(40)}
+random_stream = ShardedTaskScheduler(random_teams).run_sharded_scheduler(starting_time=9 * 60, suppress_output=True)
+for team in random_teams:
+    team_ids = sorted(task_id for _, _, tenant, task_id, _ in random_stream if tenant == team)
+    assert team_ids == list(range(1, 8)), f"Test failed: Stream for {team} does not have one record per task."
+
+#a dependency cycle in one team is rejected up front instead of hanging every team
+try:
+    ShardedTaskScheduler({"team-a": daily_tasks(), "team-cycle": [
+        Task(id=1, description='Cycle I', duration=10, dependencies=[2]),
+        Task(id=2, description='Cycle II', duration=10, dependencies=[1]),
+    ]})
+    assert False, "Test failed: Dependency cycle was not rejected."
+except ValueError as error:
+    assert "team-cycle" in str(error), "Test failed: Cycle error does not name the team."
+
+print("\nAll tests passed! Sharded scheduler matches the single scheduler for every team.")
+
+#memoised schedules: the same graph in any input order is only scheduled once
+schedule_cache = ScheduleCache(max_entries=128)
+cached_tasks = daily_tasks()
+first_result = schedule_cache.schedule(cached_tasks, starting_time=9 * 60)
+repeat_result = schedule_cache.schedule(list(reversed(daily_tasks())), starting_time=9 * 60)
+assert repeat_result == first_result and schedule_cache.hits == 1, "Test failed: Reordered task set was not served from the cache."
+assert list(first_result["order"]) == completed_order_task2, "Test failed: Cached order differs from the scheduler."
+assert first_result["total_utils"] == 855, "Test failed: Cached total utils differ from the scheduler."
+assert graph_fingerprint(daily_tasks(), 9 * 60) != graph_fingerprint(daily_tasks(), 10 * 60), "Test failed: Starting time is not part of the fingerprint."
+
+#cached tasks are not modified, and callers cannot change what later lookups see
+assert all(task.status == TaskScheduler.NOT_STARTED for task in cached_tasks), "Test failed: Cache modified the caller's tasks."
+assert schedule_cache.schedule(cached_tasks, starting_time=9 * 60) == first_result, "Test failed: Same task list missed the cache."
+changed_result = schedule_cache.schedule(cached_tasks, starting_time=9 * 60)
+changed_result["total_utils"] = 0
+assert schedule_cache.schedule(daily_tasks(), starting_time=9 * 60)["total_utils"] == 855, "Test failed: Caller changed a cached result."
+
+#task status is part of the key, since the scheduler skips completed tasks
+completed_tasks = daily_tasks()
+completed_tasks[0].status = TaskScheduler.COMPLETED
+assert graph_fingerprint(completed_tasks, 9 * 60) != graph_fingerprint(daily_tasks(), 9 * 60), "Test failed: Status is not part of the fingerprint."
+
+#least recently used results are evicted in memory and on disk, and disk results survive a new cache
+with tempfile.TemporaryDirectory() as cache_dir:
+    small_cache = ScheduleCache(max_entries=2, path=cache_dir)
+    for start in (8 * 60, 9 * 60, 10 * 60):
+        small_cache.schedule(daily_tasks(), starting_time=start)
+    assert len(small_cache) == 2, "Test failed: In-memory cache is not bounded."
+    assert len([name for name in os.listdir(cache_dir) if name.endswith(ScheduleCache.DISK_SUFFIX)]) == 2, "Test failed: Disk cache is not bounded."
+    assert small_cache.get(graph_fingerprint(daily_tasks(), 8 * 60)) is None, "Test failed: Least recently used result was not evicted."
+    disk_cache = ScheduleCache(max_entries=2, path=cache_dir)
+    assert disk_cache.schedule(daily_tasks(), starting_time=9 * 60) == first_result, "Test failed: Disk result differs."
+    assert disk_cache.hits == 1, "Test failed: Result was not read back from disk."
+
+    #malformed cache files are misses, and files the cache did not write are never evicted
+    with open(os.path.join(cache_dir, "notes.json"), "w") as f:
+        json.dump({}, f)
+    malformed_key = graph_fingerprint(daily_tasks(), 11 * 60)
+    with open(disk_cache._disk_file(malformed_key), "w") as f:
+        json.dump({}, f)
+    assert ScheduleCache(path=cache_dir).get(malformed_key) is None, "Test failed: Malformed cache file was not a miss."
+    for start in (12 * 60, 13 * 60, 14 * 60):
+        disk_cache.schedule(daily_tasks(), starting_time=start)
+    assert os.path.exists(os.path.join(cache_dir, "notes.json")), "Test failed: Disk eviction removed a foreign file."
+
+#every cached result covers all of its tasks
+for seed in range(40):
+    assert sorted(schedule_cache.schedule(random_team_tasks(7, seed), starting_time=9 * 60)["order"]) == list(range(1, 8)), \
+        f"Test failed: Cached result for seed {seed} is incomplete."
+
+#a second run of the sharded scheduler reuses every unchanged tenant
+cached_sharded = ShardedTaskScheduler({"team-a": daily_tasks(), "team-b": daily_tasks()}, cache=schedule_cache)
+hits_before = schedule_cache.hits
+assert cached_sharded.run_sharded_scheduler(starting_time=9 * 60, suppress_output=True) == sharded_stream, "Test failed: Cached sharded stream differs."
+assert schedule_cache.hits == hits_before + 2, "Test failed: Sharded tenants were not reused from the cache."
+
+print("\nAll tests passed! Repeated schedules are served from the cache.")
+
+#lookahead optimisation: compare the greedy schedule with the best one beam search finds
+optimized = ScheduleOptimizer(daily_tasks(), horizon=23 * 60).optimize(starting_time=9 * 60)
+format_time = TaskScheduler([]).format_time
+print(f"\nGreedy: {optimized['greedy']['total_utils']} utils, done at {format_time(optimized['greedy']['finish_time'])}.")
+print(f"Best found: {optimized['total_utils']} utils, done at {format_time(optimized['finish_time'])} "
+      f"(+{optimized['utils_gap']} utils, {optimized['time_gap']} mins earlier, {optimized['nodes']} states, proven optimal: {optimized['proven_optimal']}).")
+assert optimized["utils_gap"] >= 0, "Test failed: Optimiser returned a schedule worse than greedy."
+assert sorted(optimized["order"]) == list(range(1, 11)), "Test failed: Optimised schedule does not dispatch every task."
+
+#beam search against brute force on small random graphs, where greedy is not always complete
+def random_tasks(count, seed):
+    rng = random.Random(seed)
+    generated = []
+    for task_id in range(1, count + 1):
+        dependencies = rng.sample(range(1, task_id), rng.randint(0, min(2, task_id - 1)))
+        is_fixed = rng.random() < 0.3
+        generated.append(Task(id=task_id, description=f'Task {task_id}', duration=rng.randint(5, 60), dependencies=dependencies,
+                              is_fixed=is_fixed, start_time=9 * 60 + rng.randint(0, 120) if is_fixed else None,
+                              importance=rng.choice(["high", "medium", "low"])))
+    return generated
+
+def brute_force_best(tasks, starting_time, horizon):
+    #(utils, finish time) of the best dependency-respecting dispatch order
+    best = None
+    def visit(done, time, utils):
+        nonlocal best
+        if len(done) == len(tasks):
+            if best is None or (utils, -time) > (best[0], -best[1]):
+                best = (utils, time)
+            return
+        for task in tasks:
+            if task.id not in done and all(dep in done for dep in task.dependencies):
+                finish = (max(time, task.start_time) if task.is_fixed else time) + task.duration
+                visit(done | {task.id}, finish, utils + (_ready_utility(task) if finish <= horizon else 0))
+    visit(frozenset(), starting_time, 0)
+    return best
+
+searched_states = 0
+for seed in range(40):
+    optimized = ScheduleOptimizer(random_tasks(7, seed), beam_width=5040, horizon=10 * 60 + 30).optimize(starting_time=9 * 60)
+    expected = brute_force_best(random_tasks(7, seed), 9 * 60, 10 * 60 + 30)
+    assert sorted(optimized["order"]) == list(range(1, 8)), f"Test failed: Seed {seed} schedule does not dispatch every task."
+    assert optimized["proven_optimal"], f"Test failed: Seed {seed} search was not exhaustive."
+    assert (optimized["total_utils"], optimized["finish_time"]) == expected, f"Test failed: Seed {seed} differs from brute force."
+    assert sorted(optimized["greedy"]["order"]) == list(range(1, 8)), f"Test failed: Seed {seed} greedy run does not dispatch every task."
+    assert optimized["utils_gap"] >= 0 and (optimized["utils_gap"] > 0 or optimized["time_gap"] >= 0), f"Test failed: Seed {seed} is worse than greedy."
+    searched_states = max(searched_states, optimized["nodes"])
+assert searched_states > 1, "Test failed: Brute-force cases do not exercise the search."
+
+#larger graphs still get a gap to a complete greedy baseline
+larger = ScheduleOptimizer(random_tasks(100, 1), node_budget=2000, horizon=9 * 60 + 1500).optimize(starting_time=9 * 60)
+assert len(larger["greedy"]["order"]) == 100 and larger["utils_gap"] >= 0, "Test failed: Larger graph has no gap to greedy."
+
+#a dependency cycle is rejected up front instead of hanging the greedy baseline
+try:
+    ScheduleOptimizer([Task(id=1, description='Cycle I', duration=10, dependencies=[2]),
+                       Task(id=2, description='Cycle II', duration=10, dependencies=[1])])
+    assert False, "Test failed: Dependency cycle was not rejected."
+except ValueError:
+    pass
+
+#worker processes share the budget, and an empty task list has nothing to search;
+#process pools are only started when run as a script, never while the module is imported
+if __name__ == "__main__":
+    assert ScheduleOptimizer([], max_workers=2).optimize(starting_time=9 * 60)["order"] == [], "Test failed: Empty task list."
+    parallel = ScheduleOptimizer(random_tasks(7, 3), beam_width=5040, horizon=10 * 60 + 30, max_workers=2).optimize(starting_time=9 * 60)
+    assert (parallel["total_utils"], parallel["finish_time"]) == brute_force_best(random_tasks(7, 3), 9 * 60, 10 * 60 + 30), "Test failed: Parallel search differs from brute force."
+
+print("\nAll tests passed! Optimised schedule is never worse than the greedy one.")